@@ -1,13 +1,26 @@
 # app.py —— 只读 CSV 的 Streamlit 看板（无外部 API 调用）
 import os
-from datetime import date
+from datetime import datetime
+from zoneinfo import ZoneInfo
 
 import altair as alt
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 import streamlit as st
+from pyarrow import csv as pacsv
 
 st.set_page_config(page_title="YouTube Tracker", layout="wide")
 
+# pandas 写时复制：切片/派生帧共享底层数据，真正写入时才复制，不用再防御性 .copy()
+# （pandas 3 起为默认行为，该选项可能已不可设，失败就跳过）
+try:
+    pd.set_option("mode.copy_on_write", True)
+except Exception:
+    pass
+
 # 可选：页面自动刷新（若未安装则自动跳过）
 try:
     from streamlit_autorefresh import st_autorefresh
@@ -26,90 +39,225 @@ st.markdown(
     unsafe_allow_html=True,
 )
 
-# 每5分钟重新读一次 CSV（线上自动拿到最新数据）
-@st.cache_data(ttl=300)
-def load_data():
-    df = pd.read_csv("data/history.csv")
-    df["date"] = pd.to_datetime(df["date"], errors="coerce", utc=True)
-    # published_at 可能自带/不带时区，这里统一解析为带 tz 的时间
-    df["published_at"] = pd.to_datetime(df["published_at"], errors="coerce", utc=True)
+DATA_CSV = "data/history.csv"
+# 解析好的 CSV 副本（列式二进制，自带时区/类型），CSV 没变时直接读它，省掉文本解析
+DATA_PARQUET = "data/history.parquet"
+# 副本格式版本（写在 Parquet 的 schema 元数据里）：解析逻辑或列类型一改就加一，旧副本自动作废
+PARQUET_VERSION_KEY = b"history_cache_version"
+PARQUET_VERSION = b"4"
+# 副本对应的 CSV 的 (mtime, 大小)，同样写在元数据里：读时要求与当前 CSV 完全一致才用。
+# 不比较副本自身的 mtime——解析期间 CSV 被重写、或 CSV 被还原成更旧的 mtime 时，那样会把旧数据当成最新
+PARQUET_SOURCE_KEY = b"history_csv_stat"
+
+# 看板用到的列及其显式类型（Arrow CSV 解析器按此直接转换，不做类型推断）；
+# 播放量及其增量用 int64（热门视频早已超过 2^31）；点赞/评论数远小于这个量级，用 int32 省一半内存带宽
+HISTORY_COLS = [
+    "date", "video_id", "views", "likes", "comments", "title",
+    "channel_title", "published_at", "thumbnail_url", "video_url",
+]
+HISTORY_SCHEMA = {
+    # 两个时间列先按字符串读，再交给 pandas 宽松解析（见 read_history）
+    "date": pa.string(),
+    "video_id": pa.string(),
+    "views": pa.int64(),
+    "likes": pa.int32(),
+    "comments": pa.int32(),
+    "title": pa.string(),
+    "channel_title": pa.string(),
+    "published_at": pa.string(),
+    "thumbnail_url": pa.string(),
+    "video_url": pa.string(),
+}
+# load_data 里预先算好的每日增量列（同样写进 Parquet 副本）
+INC_COLS = ["views_inc", "likes_inc", "comments_inc"]
+
+def read_history(csv_mtime, csv_size):
+    """读取历史数据：优先用由当前 CSV（mtime、大小一致）生成的 Parquet 副本，否则解析 CSV 并补上增量列。"""
+    # 调用方在解析前就 stat 过：解析途中 CSV 若被重写，副本记下的是旧 stat，下次不会命中
+    source = f"{csv_mtime!r},{csv_size}".encode()
+    if os.path.exists(DATA_PARQUET):
+        try:
+            table = pq.read_table(DATA_PARQUET)
+            meta = table.schema.metadata or {}
+            if (
+                meta.get(PARQUET_VERSION_KEY) == PARQUET_VERSION
+                and meta.get(PARQUET_SOURCE_KEY) == source
+            ):
+                return table.to_pandas()
+        except Exception:
+            pass  # 副本损坏/读不了：当作没有，下面照常解析 CSV 并重写副本
+
+    # Arrow 的多线程 CSV 解析器按显式 schema 直接转换各列（BOM 也由它处理）
+    table = pacsv.read_csv(
+        DATA_CSV,
+        convert_options=pacsv.ConvertOptions(
+            column_types=HISTORY_SCHEMA,
+            include_columns=HISTORY_COLS,
+            strings_can_be_null=True,
+        ),
+    )
+    # 只有标题/频道名会带首尾空白（API 原样返回），在 Arrow 里整列去掉；id 与 URL 本就干净，不动。
+    # 三列每天都重复一遍（N 个视频 × D 天），直接字典编码，to_pandas 后即为 category，不再逐列 astype
+    for name in ("title", "channel_title", "video_id"):
+        i = table.schema.get_field_index(name)
+        col = table.column(i)
+        if name in ("title", "channel_title"):
+            col = pc.utf8_trim_whitespace(col)
+        table = table.set_column(i, name, pc.dictionary_encode(col))
+    df = table.to_pandas()
+    # 时间列不走 Arrow 的严格转换：单个坏值会让整表报错。
+    # published_at 可能自带/不带时区，这里统一解析为带 tz 的时间，解析不了的记为 NaT
+    for name in ("date", "published_at"):
+        df[name] = pd.to_datetime(df[name], errors="coerce", utc=True, format="ISO8601")
+    # 抓取日期解析不了的行既落不进任何日期区间，又会因 NaT 排在组末被当成“最新一行”，直接丢掉
+    df = df[df["date"].notna()]
+    # 只在加载时排一次序：后续按视频分组的 diff / 切片都依赖这个顺序，不再重复排序
+    df = df.sort_values(["video_id", "date"], kind="mergesort").reset_index(drop=True)
+    # 自然日（截到当天 0 点的 datetime64，区间过滤走向量化比较/二分而非逐个 date 对象）
+    df["day"] = df["date"].dt.floor("D").dt.tz_convert(None)
+    # 每日增量只依赖 CSV 内容：随数据一起算一次并缓存，交互重跑时只需按日期切片求和
+    # 三列放进同一次分组 diff；防抖：出现回退时不计负增量
+    inc = df.groupby("video_id", sort=False, observed=True)[["views", "likes", "comments"]].diff()
+    inc = inc.clip(lower=0).fillna(0)
+    df["views_inc"] = inc["views"].astype("int64")
+    df["likes_inc"] = inc["likes"].astype("int32")
+    df["comments_inc"] = inc["comments"].astype("int32")
+    # 顺手写一份 Parquet；先写临时文件再 os.replace 原子替换，读方不会看到写了一半的副本。
+    # 只读部署等写不了的环境就跳过，下次照常解析 CSV
+    tmp_path = f"{DATA_PARQUET}.{os.getpid()}.tmp"
+    try:
+        table = pa.Table.from_pandas(df)
+        table = table.replace_schema_metadata(
+            {
+                **table.schema.metadata,
+                PARQUET_VERSION_KEY: PARQUET_VERSION,
+                PARQUET_SOURCE_KEY: source,
+            }
+        )
+        pq.write_table(table, tmp_path, compression="zstd")
+        os.replace(tmp_path, DATA_PARQUET)
+    except Exception:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
     return df
 
 
-def days_since(d):
-    """返回从发布时间到现在的天数；兼容 tz-naive / tz-aware。"""
-    if pd.isna(d):
-        return None
-    if getattr(d, "tzinfo", None) is None:
-        d_utc = d.tz_localize("UTC")
-    else:
-        d_utc = d.tz_convert("UTC")
-    now_utc = pd.Timestamp.now(tz="UTC")
-    return (now_utc - d_utc).days
+# 以 CSV 的 (mtime, 大小) 作缓存键：文件一更新就重新读（页面每5分钟自动刷新，线上自动拿到最新数据），
+# 过期完全由这两个值决定，不需要 ttl。CSV 一变，旧条目就不会再命中：只留最新一份。
+# 不用 persist="disk"：磁盘上的 pickle 不受 max_entries 约束，每次定时任务重写 CSV 都会多攒一份；
+# 冷启动由原地覆盖的 Parquet 副本兜底（见 read_history）
+# 每个视频最新一行（总计信息）与 CSV 最新时间同样只依赖 CSV，随历史一起算好缓存，重跑时不必再算/哈希 df
+@st.cache_data(max_entries=1)
+def load_data(mtime, size):
+    df = read_history(mtime, size)  # 调用方已 stat 过，直接传下去核对 Parquet 副本
+    # df 已按 (video_id, date) 排序：每个视频保留最后一行即可，一次线性扫描，不用分组；
+    # 同时记下每个视频在 df 中的行区间 [row_start, row_stop)，按日期切片时直接定位
+    last = df.drop_duplicates("video_id", keep="last")
+    first = df.drop_duplicates("video_id", keep="first")
+    latest = (
+        last.assign(row_start=first.index.to_numpy(), row_stop=last.index.to_numpy() + 1)
+        # 默认按发布日期倒序（新→旧）
+        .sort_values("published_at", ascending=False, na_position="last")
+        .reset_index(drop=True)
+    )
+    return df, latest, df["date"].max()
+
+
+def slice_videos_by_day(df, videos, start_day, end_day):
+    """取 videos 里各视频在 [start_day, end_day] 内的历史行，保持 (video_id, date) 顺序。"""
+    day = df["day"].to_numpy()
+    lo_day, hi_day = np.datetime64(start_day, "ns"), np.datetime64(end_day, "ns")
+    parts = []
+    # 各视频的行在 df 中连续且按日期有序：二分找出区间两端，不必整表做日期比较
+    for start, stop in sorted(zip(videos["row_start"], videos["row_stop"])):
+        seg = day[start:stop]
+        lo = start + seg.searchsorted(lo_day, side="left")
+        hi = start + seg.searchsorted(hi_day, side="right")
+        parts.append(np.arange(lo, hi))
+    return df.iloc[np.concatenate(parts)] if parts else df.iloc[:0]
+
+
+# 文件写入时间（LA）只随 CSV 变化：以 mtime 为缓存键，文件一改立刻失效，否则重跑直接取格式化好的字符串。
+# 和 load_data 一样只留最新一份，不随定时任务每次重写 CSV 多攒一条
+@st.cache_data(max_entries=1)
+def _fmt_last_file_time(mtime):
+    # 单个标量用标准库转时区即可，不必构造 pandas Timestamp
+    return datetime.fromtimestamp(mtime, tz=ZoneInfo("America/Los_Angeles")).strftime(
+        "%Y-%m-%d %H:%M:%S %Z"
+    )
+
 
+# 单张折线图最多发送的点数；跨度很长时按等宽天数分桶，减小传给 Vega 的数据量
+MAX_CHART_POINTS = 300
+# 超过这个点数就不再给每个点画数值标签
+MAX_LABEL_POINTS = 50
 
-df = load_data()
 
-# ✅ 新增一列，取纯日期（方便和 date_input 的值对齐）
-df["day"] = df["date"].dt.date
+def downsample_series(vhist, value_how):
+    """点数超过阈值时按 N 天分桶（累计取桶内最后值、增量取桶内求和），返回 (数据, N)。
+
+    只返回图表用到的 day / value 两列：Altair 会把整张表序列化发给浏览器。
+    """
+    if len(vhist) <= MAX_CHART_POINTS:
+        return vhist[["day", "value"]], 1
+    span_days = (vhist["date"].iloc[-1] - vhist["date"].iloc[0]).days + 1
+    step = -(-span_days // MAX_CHART_POINTS)  # 向上取整
+    out = (
+        vhist.resample(f"{step}D", on="date", origin="start")
+        .agg({"day": "last", "value": value_how})
+        .dropna(subset=["day"])
+    )
+    # 空桶带来的 NaN 已去掉，value 转回原来的整数类型（int32 / int64，比 float 序列化更小）
+    out = out[["day", "value"]].astype({"value": vhist["value"].dtype}).reset_index(drop=True)
+    return out, step
+
 
 st.title("📈 YouTube 视频追踪")
 
+NO_DATA_MSG = "暂无数据，请先确保仓库中的 data/history.csv 已有内容。"
+# CSV 还不存在（定时任务尚未跑过）时给出提示，而不是在模块层直接抛错
+try:
+    csv_stat = os.stat(DATA_CSV)
+except OSError:
+    st.info(NO_DATA_MSG)
+    st.stop()
+csv_mtime = csv_stat.st_mtime
+
+df, latest, csv_last_ts = load_data(csv_mtime, csv_stat.st_size)
+
 if df.empty:
-    st.info("暂无数据，请先确保仓库中的 data/history.csv 已有内容。")
+    st.info(NO_DATA_MSG)
     st.stop()
 
 # ==== 数据最后更新时间（基于 CSV 内容 + 文件写入时间）====
-csv_last_ts = pd.to_datetime(df["date"], errors="coerce").max()
-last_file_time_la = None
-try:
-    mtime = os.path.getmtime("data/history.csv")
-    last_file_time_la = (
-        pd.to_datetime(mtime, unit="s", utc=True)
-        .tz_convert("America/Los_Angeles")
-        .strftime("%Y-%m-%d %H:%M:%S %Z")
-    )
-except Exception:
-    pass
+# csv_last_ts 由 load_data 随数据一起算好（UTC），文件写入时间复用上面 stat 得到的 mtime
+last_file_time_la = _fmt_last_file_time(csv_mtime)
 
 msg_left = (
-    f"CSV 最新日期：**{csv_last_ts.tz_convert('UTC').date().isoformat()}**"
+    f"CSV 最新日期：**{csv_last_ts.date().isoformat()}**"
     if pd.notna(csv_last_ts)
     else "CSV 最新日期：**未知**"
 )
 msg_right = f"｜ 文件更新时间（LA）：**{last_file_time_la}**" if last_file_time_la else ""
 st.info(f"🕒 {msg_left} {msg_right}")
 
-# 每个视频最新一行（总计信息）
-latest = df.sort_values("date").groupby("video_id").tail(1).copy()
-# 默认按发布日期倒序（新→旧）
-latest = latest.sort_values("published_at", ascending=False, na_position="last")
-
 # -------- 侧边筛选 --------
 with st.sidebar:
     st.header("筛选 & 工具")
 
     # 频道筛选（含 All）
-    channels = sorted(latest["channel_title"].dropna().unique().tolist())
+    # channel_title 是 category：只对去掉未出现项后的类别排序，不必对整列 unique
+    channels = sorted(
+        latest["channel_title"].cat.remove_unused_categories().cat.categories.tolist()
+    )
     channel_options = ["All"] + channels
     sel_channel = st.selectbox("按频道筛选", channel_options, index=0)
 
-    # 指标与数值模式
-    metric_label = st.selectbox(
-        "折线图指标", ["播放量 (Views)", "点赞数 (Likes)", "评论数 (Comments)"], index=0
-    )
-    metric_map = {
-        "播放量 (Views)": ("views", "播放量"),
-        "点赞数 (Likes)": ("likes", "点赞数"),
-        "评论数 (Comments)": ("comments", "评论数"),
-    }
-    metric_col, metric_cn = metric_map[metric_label]
-
-    mode = st.radio("数值模式", ["累计", "每日增量"], index=0, horizontal=True)
-
     # 日期范围（影响：折线图、顶部区间增量KPI）
-    min_d = df["day"].min()
-    max_d = df["day"].max()
+    min_d = df["day"].min().date()
+    max_d = df["day"].max().date()
     picked = st.date_input("折线图日期范围", value=(min_d, max_d), key="range")
     if isinstance(picked, (list, tuple)) and len(picked) == 2:
         start_day, end_day = picked
@@ -127,32 +275,30 @@ with st.sidebar:
     if st.button("🔄 刷新数据（清缓存）", key="refresh"):
         st.cache_data.clear()
         st.rerun()
+    # 调试信息默认关闭，打开时才生成
+    show_debug = st.toggle("显示调试信息", value=False, key="debug")
 
 # 根据频道筛选
 filtered_latest = (
     latest if sel_channel == "All" else latest[latest["channel_title"] == sel_channel]
 )
 
-# 应用排序
-if sort_label == "按发布日期（新→旧）":
-    filtered_latest = filtered_latest.sort_values(
-        "published_at", ascending=False, na_position="last"
-    )
-else:
+# 应用排序（latest 本身已按发布日期新→旧排好，选这一项时无需再排）
+if sort_label != "按发布日期（新→旧）":
     sort_col = sort_map[sort_label]
     filtered_latest = filtered_latest.sort_values(sort_col, ascending=False)
 
-selected_ids = set(filtered_latest["video_id"].tolist())
-
 # ====== 用“自然日 day”做统一过滤（折线图 & KPI） ======
-hist_df = df[df["video_id"].isin(selected_ids)].copy()
-show_df_for_chart = hist_df[(hist_df["day"] >= start_day) & (hist_df["day"] <= end_day)].copy()
+# 当前频道各视频在所选日期内的历史（带每日增量列），折线图与区间 KPI 共用；
+# 按各视频行区间二分切片，省掉整表的 isin 与日期比较
+range_df = slice_videos_by_day(df, filtered_latest, start_day, end_day)
 
 # 🔍 Debug：直观看到日期是否生效
-st.info(f"当前区间：{start_day} → {end_day} ｜ 过滤后行数：{show_df_for_chart.shape[0]}")
+if show_debug:
+    st.info(f"当前区间：{start_day} → {end_day} ｜ 过滤后行数：{range_df.shape[0]}")
 
 # 如果选择的结束日期 > 数据最新日期，提示
-data_max_day = df["day"].max()
+data_max_day = max_d
 if data_max_day and end_day > data_max_day:
     st.warning(
         f"所选结束日期 **{end_day}** 超过当前数据最新日期 **{data_max_day}**，图表只显示到 {data_max_day}。"
@@ -161,10 +307,9 @@ if data_max_day and end_day > data_max_day:
 st.caption(f"数据按天记录；频道：{sel_channel} ｜ 视频数：{filtered_latest.shape[0]}")
 
 # 全局 KPI（总量/率）：针对当前频道筛选（各视频“最新一行”加总），与日期无关
-kpi_scope = filtered_latest.copy()
-total_views = int(kpi_scope["views"].sum())
-total_likes = int(kpi_scope["likes"].sum())
-total_comments = int(kpi_scope["comments"].sum())
+total_views = int(filtered_latest["views"].sum())
+total_likes = int(filtered_latest["likes"].sum())
+total_comments = int(filtered_latest["comments"].sum())
 like_rate = (total_likes / total_views * 100) if total_views > 0 else 0.0
 comment_rate = (total_comments / total_views * 100) if total_views > 0 else 0.0
 
@@ -176,18 +321,9 @@ k4.metric("Like Rate（点赞率）", f"{like_rate:.2f}%")
 k5.metric("Comment Rate（评论率）", f"{comment_rate:.2f}%")
 
 # 顶部 KPI 汇总（按当前日期筛选后的“区间增量”，全体视频）
-# 关键：在“全量历史”上先计算每日增量，再按所选日期范围过滤
-base = df[df["video_id"].isin(selected_ids)].sort_values(["video_id", "date"]).copy()
-for col in ["views", "likes", "comments"]:
-    inc_col = f"{col}_inc"
-    base[inc_col] = base.groupby("video_id")[col].diff().fillna(0)
-    base.loc[base[inc_col] < 0, inc_col] = 0  # 防抖：出现回退时不计负增量
-
-interval_df = base[(base["day"] >= start_day) & (base["day"] <= end_day)].copy()
-
-iv_views = int(interval_df["views_inc"].sum()) if not interval_df.empty else 0
-iv_likes = int(interval_df["likes_inc"].sum()) if not interval_df.empty else 0
-iv_comments = int(interval_df["comments_inc"].sum()) if not interval_df.empty else 0
+# 关键：在“全量历史”上先计算每日增量（见 load_data），再按所选日期范围过滤
+# 区间切片与折线图共用同一份 range_df；三列一次求和（空区间时即为 0）
+iv_views, iv_likes, iv_comments = (int(v) for v in range_df[INC_COLS].sum())
 
 i1, i2, i3 = st.columns(3)
 i1.metric("本期总增量 · 播放量", f"{iv_views:,}")
@@ -195,64 +331,109 @@ i2.metric("本期总增量 · 点赞数", f"{iv_likes:,}")
 i3.metric("本期总增量 · 评论数", f"{iv_comments:,}")
 
 # ====== 各视频单卡片 + 折线（带点与数值标签） ======
-for _, row in filtered_latest.iterrows():
-    vid = row["video_id"]
-    col1, col2 = st.columns([1, 3])
-
-    with col1:
-        thumb = row.get("thumbnail_url", None)
-        st.markdown("<div class='thumb-cell'>", unsafe_allow_html=True)
-        if pd.notna(thumb) and thumb:
-            st.image(thumb, use_container_width=True)
-        st.markdown("</div>", unsafe_allow_html=True)
-        st.markdown(f"[▶️ 打开视频]({row['video_url']})")
-
-    with col2:
-        st.subheader(f"{row['title']}")
-        st.write(f"**频道**：{row['channel_title']}")
-        pub = row["published_at"]
-        dcount = days_since(pub)
-        pub_text = (
-            pub.tz_convert("UTC").date().isoformat() if pd.notna(pub) else "未知"
-        )
-        st.write(f"**发布日期**：{pub_text}  ｜  **已发布**：{dcount} 天")
-        c1, c2, c3 = st.columns(3)
-        c1.metric("总播放量", f"{int(row['views']):,}")
-        c2.metric("总点赞数", f"{int(row['likes']):,}")
-        c3.metric("总评论数", f"{int(row['comments']):,}")
-
-        vhist = (
-            show_df_for_chart[show_df_for_chart["video_id"] == vid]
-            .sort_values("date")
-            .copy()
-        )
-        if vhist.empty:
-            st.info("当前日期范围内无数据")
-            continue
-
-        if mode == "每日增量":
-            vhist["value"] = vhist[metric_col].diff().fillna(0)
-            vhist.loc[vhist["value"] < 0, "value"] = 0
-            y_title = f"{metric_cn}（每日增量）"
-        else:
-            vhist["value"] = vhist[metric_col]
-            y_title = f"{metric_cn}（累计）"
-
-        base_chart = alt.Chart(vhist).encode(
-            # ✅ 用 day 画 X 轴，和选择器一致
-            x=alt.X("day:T", title="日期"),
-            y=alt.Y("value:Q", title=y_title),
-            tooltip=[
-                alt.Tooltip("day:T", title="日期"),
-                alt.Tooltip("value:Q", title=y_title, format=","),
-            ],
-        )
-        line = base_chart.mark_line()
-        points = base_chart.mark_point(size=40)
-        labels = base_chart.mark_text(dy=-8).encode(text=alt.Text("value:Q", format=","))
+# 卡片区放进 fragment：折线图指标/数值模式两个控件在区内，切换时只重跑这一块，
+# 顶部 KPI 与侧边栏不必重算
+@st.fragment
+def render_cards(filtered_latest, range_df):
+    m1, m2 = st.columns([1, 2])
+    metric_label = m1.selectbox(
+        "折线图指标", ["播放量 (Views)", "点赞数 (Likes)", "评论数 (Comments)"], index=0
+    )
+    metric_map = {
+        "播放量 (Views)": ("views", "播放量"),
+        "点赞数 (Likes)": ("likes", "点赞数"),
+        "评论数 (Comments)": ("comments", "评论数"),
+    }
+    metric_col, metric_cn = metric_map[metric_label]
+    mode = m2.radio("数值模式", ["累计", "每日增量"], index=0, horizontal=True)
 
-        chart = (line + points + labels).properties(height=220)
-        st.altair_chart(chart, use_container_width=True)
+    # 折线图的数值列：每日增量直接复用 load_data 预算好的 *_inc 列（与区间 KPI 口径一致），
+    # 所选区间第一天也显示它相对前一天的真实增量
+    if mode == "每日增量":
+        chart_values = range_df[f"{metric_col}_inc"]
+        y_title = f"{metric_cn}（每日增量）"
+    else:
+        chart_values = range_df[metric_col]
+        y_title = f"{metric_cn}（累计）"
+    # 只带分组、分桶和画图要用的列
+    show_df_for_chart = range_df[["video_id", "date", "day"]].assign(value=chart_values)
+    # 一次性按视频分组（组内已按日期排好），卡片循环里直接按 video_id 取，避免每张卡片全表扫描
+    per_vid = dict(tuple(show_df_for_chart.groupby("video_id", sort=False, observed=True)))
+
+    # 各卡片的编码只差 y 轴标题（分桶时带“每N日”）：按标题建一次、循环里复用，
+    # 不必每张卡片重新构造/校验一遍 X/Y/Tooltip 对象
+    encodings = {}
+
+    def chart_encoding(chart_y_title):
+        if chart_y_title not in encodings:
+            encodings[chart_y_title] = dict(
+                # ✅ 用 day 画 X 轴，和选择器一致
+                x=alt.X("day:T", title="日期"),
+                y=alt.Y("value:Q", title=chart_y_title),
+                tooltip=[
+                    alt.Tooltip("day:T", title="日期"),
+                    alt.Tooltip("value:Q", title=chart_y_title, format=","),
+                ],
+            )
+        return encodings[chart_y_title]
+
+    label_text = alt.Text("value:Q", format=",")
+
+    card_cols = [
+        "video_id", "title", "channel_title", "pub_text", "days_since",
+        "views", "likes", "comments", "thumbnail_url", "video_url",
+    ]
+    # name=None 直接产出普通 tuple，按位置解包成局部变量，省掉 namedtuple 的构造与属性查找
+    for (
+        vid, title, channel_title, pub_text, days_published,
+        views, likes, comments, thumb, video_url,
+    ) in filtered_latest[card_cols].itertuples(index=False, name=None):
+        col1, col2 = st.columns([1, 3])
+
+        with col1:
+            st.markdown("<div class='thumb-cell'>", unsafe_allow_html=True)
+            if isinstance(thumb, str) and thumb:
+                st.image(thumb, use_container_width=True)
+            st.markdown("</div>", unsafe_allow_html=True)
+            st.markdown(f"[▶️ 打开视频]({video_url})")
+
+        with col2:
+            st.subheader(f"{title}")
+            st.write(f"**频道**：{channel_title}")
+            st.write(f"**发布日期**：{pub_text}  ｜  **已发布**：{days_published} 天")
+            c1, c2, c3 = st.columns(3)
+            c1.metric("总播放量", f"{int(views):,}")
+            c2.metric("总点赞数", f"{int(likes):,}")
+            c3.metric("总评论数", f"{int(comments):,}")
+
+            vhist = per_vid.get(vid)
+            if vhist is None or vhist.empty:
+                st.info("当前日期范围内无数据")
+                continue
+
+            vhist, step = downsample_series(vhist, "sum" if mode == "每日增量" else "last")
+            chart_y_title = (
+                f"{metric_cn}（每{step}日增量）" if mode == "每日增量" and step > 1 else y_title
+            )
+            base_chart = alt.Chart(vhist).encode(**chart_encoding(chart_y_title))
+            layers = [base_chart.mark_line(), base_chart.mark_point(size=40)]
+            # 点多时数值标签本就挤成一团，且 text 是最贵的 mark：只在点数不多时画
+            if len(vhist) <= MAX_LABEL_POINTS:
+                layers.append(base_chart.mark_text(dy=-8).encode(text=label_text))
+
+            chart = alt.layer(*layers).properties(height=220)
+            st.altair_chart(chart, use_container_width=True)
+
+
+# 发布日期文本与“已发布天数”整列一次算好（published_at 已是 UTC），不在卡片里逐行算
+pub_utc = filtered_latest["published_at"]
+days_since = (pd.Timestamp.now(tz="UTC") - pub_utc).dt.days
+filtered_latest = filtered_latest.assign(
+    pub_text=pub_utc.dt.strftime("%Y-%m-%d").fillna("未知"),
+    # 整数天数放进 object 列，缺失/解析失败的发布时间保持 None（而不是显示成 <NA>）
+    days_since=days_since.astype("Int64").astype(object).where(days_since.notna(), None),
+)
+render_cards(filtered_latest, range_df)
 
 st.write("---")
 st.caption("数据来源：data/history.csv（由定时任务更新）。时区：America/Los_Angeles。")
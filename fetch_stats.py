@@ -2,13 +2,16 @@
 import os
 import sys
 import re
-import time
+import csv
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import Optional, List, Dict
 
 import pandas as pd
 import requests
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from pytz import timezone
 
 # ---------------- 基础设置 ----------------
@@ -42,13 +45,16 @@ _YT_PATTERNS = [
     r"shorts/([A-Za-z0-9_-]{11})",     # shorts/ID
     r"embed/([A-Za-z0-9_-]{11})",      # embed/ID
 ]
+# 模块加载时编译一次，避免每次调用都查 re 的内部缓存
+_YT_COMPILED = [re.compile(p) for p in _YT_PATTERNS]
+_ID_RE = re.compile(r"[A-Za-z0-9_-]{11}")
 
 def extract_video_id(url_or_id: str) -> Optional[str]:
     s = (url_or_id or "").strip()
-    if re.fullmatch(r"[A-Za-z0-9_-]{11}", s):
+    if _ID_RE.fullmatch(s):
         return s
-    for p in _YT_PATTERNS:
-        m = re.search(p, s)
+    for p in _YT_COMPILED:
+        m = p.search(s)
         if m:
             return m.group(1)
     return None
@@ -86,9 +92,20 @@ def read_video_ids() -> List[str]:
     return ids
 
 # ---------------- 请求封装（含重试） ----------------
+# 同一个 Session 复用连接（keep-alive，批次之间不再重复 TLS 握手）；
+# 超时/连接错误/5xx 交给 urllib3 退避重试（约 0s、2s、4s）
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(max_retries=Retry(
+    total=3,
+    backoff_factor=1.0,
+    status_forcelist=[500, 502, 503, 504],
+    allowed_methods=["GET"],
+    raise_on_status=False,  # 重试用尽后仍返回响应，交给 raise_for_status 打印服务端信息
+)))
+
 def get_video_items(video_ids: List[str]) -> List[Dict]:
     """
-    用 requests 获取一批视频的 snippet+statistics，带超时与退避重试。
+    用共享 Session 获取一批视频的 snippet+statistics，带超时与退避重试。
     """
     params = {
         "part": "snippet,statistics",
@@ -96,38 +113,57 @@ def get_video_items(video_ids: List[str]) -> List[Dict]:
         "key": API_KEY,
     }
 
-    backoff = [0, 2, 5]  # 3 次：立刻、2s、5s
-    last_err = None
-
-    for delay in backoff:
-        try:
-            if delay:
-                time.sleep(delay)
-            resp = requests.get(
-                BASE_URL,
-                params=params,
-                timeout=20,
-                proxies=PROXIES if USE_PROXIES else None,
-            )
-            resp.raise_for_status()
-            data = resp.json()
-            return data.get("items", [])
-        except (requests.exceptions.Timeout,
-                requests.exceptions.ConnectionError) as e:
-            last_err = e
-            continue
-        except requests.exceptions.HTTPError as e:
-            # 4xx/5xx：打印服务端信息后直接抛出，方便定位（例如配额/Key限制）
-            text = getattr(e.response, "text", "")[:300]
-            print(f"HTTPError: {e} — {text}")
-            raise
-        except Exception as e:
-            last_err = e
-            continue
-
-    if last_err:
-        raise last_err
-    return []
+    resp = SESSION.get(
+        BASE_URL,
+        params=params,
+        timeout=20,
+        proxies=PROXIES if USE_PROXIES else None,
+    )
+    try:
+        resp.raise_for_status()
+    except requests.exceptions.HTTPError as e:
+        # 4xx/5xx：打印服务端信息后直接抛出，方便定位（例如配额/Key限制）
+        text = getattr(e.response, "text", "")[:300]
+        print(f"HTTPError: {e} — {text}")
+        raise
+    return resp.json().get("items", [])
+
+# ---------------- 写入 history ----------------
+def append_rows(rows: List[Dict]) -> Optional[int]:
+    """
+    新行与已有 (video_id, date) 无冲突且表头一致时，用 csv 直接追加并返回历史行数；
+    否则返回 None，由调用方走完整合并。
+    """
+    with open(DATA_CSV, newline="", encoding="utf-8") as f:
+        header = next(csv.reader(f), [])
+    if header != list(rows[0].keys()):
+        return None
+
+    keys = pd.read_csv(DATA_CSV, usecols=["video_id", "date"], dtype=str)
+    seen = set(zip(keys["video_id"], keys["date"]))
+    if any((r["video_id"], r["date"]) in seen for r in rows):
+        return None
+
+    # 文件若不以换行结尾，先补一个，避免新行粘在最后一行上
+    with open(DATA_CSV, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        needs_newline = f.read(1) != b"\n"
+    with open(DATA_CSV, "a", newline="", encoding="utf-8") as f:
+        if needs_newline:
+            f.write("\n")
+        csv.DictWriter(f, fieldnames=header, lineterminator="\n").writerows(rows)
+    return len(keys) + len(rows)
+
+def merge_rows(rows: List[Dict]) -> int:
+    """与历史合并：同一 (video_id, date) 以新抓的为准，整表排序后重写，返回历史行数。"""
+    old_df = pd.read_csv(DATA_CSV)
+    merged = pd.concat([old_df, pd.DataFrame(rows)], ignore_index=True)
+    merged = (
+        merged.sort_values(["video_id", "date"])
+              .drop_duplicates(subset=["video_id", "date"], keep="last")
+    )
+    merged.to_csv(DATA_CSV, index=False)
+    return len(merged)
 
 # ---------------- 主流程 ----------------
 def main():
@@ -136,56 +172,59 @@ def main():
         return
 
     all_rows = []
-    # 小批量更稳（25 一批）
-    for batch in chunk(video_ids, 25):
-        items = get_video_items(batch)
-        for it in items:
-            vid = it.get("id")
-            snip = it.get("snippet", {}) or {}
-            stats = it.get("statistics", {}) or {}
-
-            thumbs = snip.get("thumbnails", {}) or {}
-            thumb = (
-                (thumbs.get("maxres") or {}).get("url") or
-                (thumbs.get("high")   or {}).get("url") or
-                (thumbs.get("medium") or {}).get("url") or
-                (thumbs.get("default") or {}).get("url")
-            )
-
-            def _to_int(x):
-                try:
-                    return int(x)
-                except Exception:
-                    return 0
-
-            row = {
-                "date": today_la_str(),
-                "video_id": vid,
-                "views": _to_int(stats.get("viewCount")),
-                "likes": _to_int(stats.get("likeCount")),
-                "comments": _to_int(stats.get("commentCount")),
-                "title": snip.get("title", ""),
-                "channel_title": snip.get("channelTitle", ""),
-                "published_at": snip.get("publishedAt", ""),
-                "thumbnail_url": thumb,
-                "video_url": f"https://www.youtube.com/watch?v={vid}",
-            }
-            all_rows.append(row)
-
-    new_df = pd.DataFrame(all_rows)
+    # 小批量更稳（25 一批）；各批之间互不依赖且耗时主要在网络等待，用线程并发请求
+    batches = list(chunk(video_ids, 25))
+    with ThreadPoolExecutor(max_workers=min(8, len(batches))) as ex:
+        results = list(ex.map(get_video_items, batches))  # map 保持批次顺序
+
+    for it in (item for items in results for item in items):
+        vid = it.get("id")
+        snip = it.get("snippet", {}) or {}
+        stats = it.get("statistics", {}) or {}
+
+        thumbs = snip.get("thumbnails", {}) or {}
+        thumb = (
+            (thumbs.get("maxres") or {}).get("url") or
+            (thumbs.get("high")   or {}).get("url") or
+            (thumbs.get("medium") or {}).get("url") or
+            (thumbs.get("default") or {}).get("url")
+        )
+
+        def _to_int(x):
+            try:
+                return int(x)
+            except Exception:
+                return 0
+
+        row = {
+            "date": today_la_str(),
+            "video_id": vid,
+            "views": _to_int(stats.get("viewCount")),
+            "likes": _to_int(stats.get("likeCount")),
+            "comments": _to_int(stats.get("commentCount")),
+            "title": snip.get("title", ""),
+            "channel_title": snip.get("channelTitle", ""),
+            "published_at": snip.get("publishedAt", ""),
+            "thumbnail_url": thumb,
+            "video_url": f"https://www.youtube.com/watch?v={vid}",
+        }
+        all_rows.append(row)
+
+    if not all_rows:
+        print("⚠️ 未获取到任何视频数据，history 保持不变")
+        return
 
+    # 当天第一次抓取时 (video_id, date) 不会和历史冲突：直接追加到文件末尾，
+    # 不必读入整份历史再 concat/排序/整表重写；同一天再次抓取（需覆盖当天旧值）才走完整合并
     if os.path.exists(DATA_CSV) and os.path.getsize(DATA_CSV) > 0:
-        old_df = pd.read_csv(DATA_CSV)
-        merged = pd.concat([old_df, new_df], ignore_index=True)
-        merged = (
-            merged.sort_values(["video_id", "date"])
-                  .drop_duplicates(subset=["video_id", "date"], keep="last")
-        )
+        history_size = append_rows(all_rows)
+        if history_size is None:
+            history_size = merge_rows(all_rows)
     else:
-        merged = new_df
+        pd.DataFrame(all_rows).to_csv(DATA_CSV, index=False)
+        history_size = len(all_rows)
 
-    merged.to_csv(DATA_CSV, index=False)
-    print(f"✅ Saved {len(new_df)} rows. History size: {len(merged)}")
+    print(f"✅ Saved {len(all_rows)} rows. History size: {history_size}")
 
 if __name__ == "__main__":
     try:
@@ -14,13 +14,16 @@ _YT_PATTERNS = [
     r"shorts/([A-Za-z0-9_-]{11})",           # shorts/ID
     r"embed/([A-Za-z0-9_-]{11})",            # embed/ID
 ]
+# 模块加载时编译一次，避免每次调用都查 re 的内部缓存
+_YT_COMPILED = [re.compile(p) for p in _YT_PATTERNS]
+_ID_RE = re.compile(r"[A-Za-z0-9_-]{11}")
 
 def extract_video_id(url_or_id: str) -> Optional[str]:
     s = url_or_id.strip()
-    if re.fullmatch(r"[A-Za-z0-9_-]{11}", s):
+    if _ID_RE.fullmatch(s):
         return s
-    for p in _YT_PATTERNS:
-        m = re.search(p, s)
+    for p in _YT_COMPILED:
+        m = p.search(s)
         if m:
             return m.group(1)
     return None